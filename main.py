@@ -1,15 +1,42 @@
 from math import sqrt, sin, cos, ceil, pi
 import sys
+import csv
+from collections import deque
+from time import perf_counter
+from weakref import WeakKeyDictionary
 from random import randrange, uniform
-from PyQt6.QtCore import Qt, QRect, QPoint, QTimer
-from PyQt6.QtWidgets import QApplication, QWidget, QMainWindow, QSlider, QSpinBox, QComboBox, QLabel, QRadioButton, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QLineEdit, QColorDialog
-from PyQt6.QtGui import QPainter, QPen, QColor, QPolygon, QBrush, QFont, QPalette
+from PyQt6.QtCore import Qt, QRect, QRectF, QPoint, QPointF, QLine, QTimer
+from PyQt6.QtWidgets import QApplication, QWidget, QMainWindow, QSlider, QSpinBox, QComboBox, QLabel, QRadioButton, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QLineEdit, QColorDialog, QFileDialog, QMessageBox
+from PyQt6.QtGui import QPainter, QPen, QColor, QPolygon, QBrush, QFont, QPalette, QPainterPath, QShortcut, QKeySequence
+try:
+	from PyQt6.QtOpenGLWidgets import QOpenGLWidget
+except ImportError:
+	QOpenGLWidget = None
 
 def point_line_range(point: QPoint, lineA: QPoint, lineB: QPoint):
 	A = (lineA.y() - lineB.y())
 	B = (lineB.x() - lineA.x())
 	return abs(A * point.x() + B * point.y() + (lineA.x() * lineB.y() - lineB.x() * lineA.y())) / sqrt(A * A + B * B)
 
+def point_segment_range(point: QPoint, lineA: QPoint, lineB: QPoint):
+	dx = lineB.x() - lineA.x()
+	dy = lineB.y() - lineA.y()
+	ax = point.x() - lineA.x()
+	ay = point.y() - lineA.y()
+	if dx == 0 and dy == 0:
+		return sqrt(ax * ax + ay * ay)
+	t = (ax * dx + ay * dy) / (dx * dx + dy * dy)
+	if t <= 0:
+		return sqrt(ax * ax + ay * ay)
+	if t >= 1:
+		bx = point.x() - lineB.x()
+		by = point.y() - lineB.y()
+		return sqrt(bx * bx + by * by)
+	return point_line_range(point, lineA, lineB)
+
+def link_range(ratingA, ratingB):
+	return sqrt(ratingA * ratingB) #км, мощность хранится в единицах 'k'
+
 def parse_rating(rating):
 	cnt = 0
 	rate = rating
@@ -43,6 +70,273 @@ def unparse_rating(rating):
 		raise ValueError('Parsing multiplier error')
 	return rate * pow(1000, cnt)
 
+TRAIL_LENGTH = 240 #точек
+TRAIL_STEP = 5 #тиков таймера между точками
+LINK_HISTORY_DEPTH = 8 #замеров
+ROOT_RATING = unparse_rating({'value': 250, 'mult': 'G'}) #мощность наземной станции
+OUTAGE_CHUNK = 1024 #строк журнала между записями на диск
+OUTAGE_HISTORY = 5 #последних завершённых отключений на экране
+JOURNAL_LENGTH = 1000 #шагов отмены
+SNAPSHOT_CHUNK = 32 #записей в общем блоке снимка
+
+class Batch():
+	def __init__(self):
+		self.paths = {}
+
+	def path(self, pen_color, brush_color, width, style):
+		key = (pen_color.rgba(), brush_color.rgba(), width, style)
+		path = self.paths.get(key)
+		if path is None:
+			path = QPainterPath()
+			path.setFillRule(Qt.FillRule.WindingFill)
+			self.paths[key] = path
+		return path
+
+	def addEllipse(self, rect, pen_color, brush_color, width=2, style=Qt.PenStyle.SolidLine):
+		self.path(pen_color, brush_color, width, style).addEllipse(QRectF(rect))
+
+	def draw(self, painter):
+		for (pen_rgba, brush_rgba, width, style), path in self.paths.items():
+			pen = QPen()
+			pen.setColor(QColor.fromRgba(pen_rgba))
+			pen.setStyle(style)
+			pen.setWidth(width)
+			painter.setPen(pen)
+			painter.setBrush(QColor.fromRgba(brush_rgba))
+			painter.drawPath(path)
+
+class Trail():
+	def __init__(self, size):
+		self.size = size
+		self.points = None
+		self.head = 0
+		self.count = 0
+
+	def push(self, point):
+		if self.points is None:
+			self.points = [QPoint() for i in range(self.size)]
+		self.points[self.head].setX(point.x())
+		self.points[self.head].setY(point.y())
+		self.head = (self.head + 1) % self.size
+		self.count = min(self.count + 1, self.size)
+
+	def clear(self):
+		self.points = None
+		self.head = 0
+		self.count = 0
+
+	def draw(self, batch, color):
+		if self.count < 2:
+			return
+		path = batch.path(QColor(color.red(), color.green(), color.blue(), 120), QColor(0, 0, 0, 0), 1, Qt.PenStyle.SolidLine)
+		start = self.head if self.count == self.size else 0
+		path.moveTo(QPointF(self.points[start]))
+		for index in range(1, self.count):
+			path.lineTo(QPointF(self.points[(start + index) % self.size]))
+
+class LinkHistory():
+	def __init__(self, depth):
+		self.lines = []
+		self.head = 0
+		self.starts = [0] * depth
+		self.counts = [0] * depth
+		self.sample = 0
+		self.depth = depth
+
+	def push(self, links):
+		if len(links) * self.depth > len(self.lines):
+			self.lines = [QLine() for i in range(max(len(links) * self.depth, len(self.lines) * 2))]
+			self.clear()
+		self.sample = (self.sample + 1) % self.depth
+		self.starts[self.sample] = self.head
+		self.counts[self.sample] = len(links)
+		for a, b in links:
+			self.lines[self.head].setLine(a.center.x(), a.center.y(), b.center.x(), b.center.y())
+			self.head = (self.head + 1) % len(self.lines)
+
+	def clear(self):
+		for index in range(self.depth):
+			self.counts[index] = 0
+		self.head = 0
+
+	def draw(self, painter):
+		pen = QPen()
+		pen.setStyle(Qt.PenStyle.SolidLine)
+		pen.setWidth(1)
+		for age in reversed(range(self.depth)):
+			sample = (self.sample - age) % self.depth
+			if self.counts[sample] == 0:
+				continue
+			start = self.starts[sample]
+			lines = [self.lines[(start + index) % len(self.lines)] for index in range(self.counts[sample])]
+			pen.setColor(QColor(230, 120, 20, round(200 * (self.depth - age) / self.depth)))
+			painter.setPen(pen)
+			painter.drawLines(lines)
+
+class OutageMonitor():
+	def __init__(self):
+		self.active = {}
+		self.history = deque(maxlen=OUTAGE_HISTORY)
+		self.series_file = None
+		self.intervals_file = None
+		self.series_rows = []
+		self.interval_rows = []
+		self.error = None
+
+	def isRecording(self):
+		return self.series_file is not None
+
+	def update(self, tick, status):
+		for body in list(self.active):
+			if status.get(body, True):
+				self.close(body, tick)
+		for body, connected in status.items():
+			if not connected and body not in self.active:
+				self.active[body] = tick
+			if self.isRecording():
+				self.series_rows.append((tick, body.name, int(connected)))
+		if len(self.series_rows) >= OUTAGE_CHUNK:
+			self.flush()
+
+	def close(self, body, tick):
+		start = self.active.pop(body)
+		record = (body.name, start, tick, tick - start)
+		self.history.append(record)
+		if self.isRecording():
+			self.interval_rows.append(record)
+
+	def reset(self):
+		self.active = {}
+		self.history.clear()
+		self.error = None
+
+	def start(self, path, tick):
+		self.stop(tick)
+		base = path[:-4] if path.endswith(".csv") else path
+		series_file = open(base + ".csv", "w", newline="", encoding="utf-8")
+		try:
+			intervals_file = open(base + "_outages.csv", "w", newline="", encoding="utf-8")
+		except OSError:
+			series_file.close()
+			raise
+		try:
+			csv.writer(series_file).writerow(("tick", "body", "connected"))
+			csv.writer(intervals_file).writerow(("body", "start", "end", "duration"))
+		except OSError:
+			series_file.close()
+			intervals_file.close()
+			raise
+		self.series_file = series_file
+		self.intervals_file = intervals_file
+
+	def flush(self):
+		if not self.isRecording():
+			return
+		try:
+			csv.writer(self.series_file).writerows(self.series_rows)
+			csv.writer(self.intervals_file).writerows(self.interval_rows)
+			self.series_file.flush()
+			self.intervals_file.flush()
+		except OSError as error:
+			self.error = error
+			self.close_files()
+		self.series_rows.clear()
+		self.interval_rows.clear()
+
+	def stop(self, tick):
+		if not self.isRecording():
+			return
+		for body, start in self.active.items():
+			self.interval_rows.append((body.name, start, "", tick - start))
+		self.flush()
+		self.close_files()
+
+	def close_files(self):
+		for file in (self.series_file, self.intervals_file):
+			if file is None:
+				continue
+			try:
+				file.close()
+			except OSError:
+				pass
+		self.series_file = None
+		self.intervals_file = None
+
+	def draw(self, painter, scale, tick):
+		alerts = Batch()
+		for body in self.active:
+			alert_rad = max(6, round(body.radius * scale) + 4)
+			alerts.addEllipse(QRect(body.center.x() - alert_rad, body.center.y() - alert_rad, alert_rad * 2, alert_rad * 2), QColor(220, 30, 30), QColor(0, 0, 0, 0), 2, Qt.PenStyle.DashLine)
+		alerts.draw(painter)
+		painter.setFont(QFont('', 10))
+		active = [f'{body.name}: нет связи {tick - start}' for body, start in self.active.items()]
+		history = [f'{name}: связь потеряна на {duration} ({start}–{end})' for name, start, end, duration in reversed(self.history)]
+		painter.setPen(QPen(QColor(220, 30, 30)))
+		painter.drawText(QRect(10, 8, 880, 880), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop, "\n".join(active))
+		painter.setPen(QPen(QColor(120, 120, 120)))
+		painter.drawText(QRect(10, 8, 880, 880), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop, "\n" * len(active) + "\n".join(history))
+
+class Journal():
+	def __init__(self):
+		self.states = WeakKeyDictionary()
+		self.origin = None
+		self.current = None
+		self.undo_stack = deque(maxlen=JOURNAL_LENGTH)
+		self.redo_stack = []
+		self.log = []
+
+	def start(self, snapshot):
+		self.origin = snapshot
+		self.current = snapshot
+		self.undo_stack.clear()
+		self.redo_stack.clear()
+		self.log.clear()
+
+	def record(self, obj):
+		state = obj.state()
+		cached = self.states.get(obj)
+		if cached is None or cached != state:
+			cached = state
+			self.states[obj] = cached
+		return (obj, cached)
+
+	def share(self, records, previous):
+		chunks = []
+		for pos, index in enumerate(range(0, len(records), SNAPSHOT_CHUNK)):
+			chunk = tuple(records[index:index + SNAPSHOT_CHUNK])
+			if pos < len(previous) and previous[pos] == chunk:
+				chunk = previous[pos]
+			chunks.append(chunk)
+		return tuple(chunks)
+
+	def snapshot(self, objects, constellations, active_obj, active_constellation):
+		previous = self.current if self.current is not None else ((), (), None, None)
+		return (self.share([self.record(obj) for obj in objects], previous[0]), self.share([self.record(constellation) for constellation in constellations], previous[1]), active_obj, active_constellation)
+
+	def commit(self, snapshot, entry):
+		if snapshot[:2] == self.current[:2]:
+			return
+		self.undo_stack.append(self.current)
+		self.redo_stack.clear()
+		self.current = snapshot
+		self.log.append(entry)
+
+	def undo(self, entry):
+		if len(self.undo_stack) == 0:
+			return None
+		self.redo_stack.append(self.current)
+		self.current = self.undo_stack.pop()
+		self.log.append(entry)
+		return self.current
+
+	def redo(self, entry):
+		if len(self.redo_stack) == 0:
+			return None
+		self.undo_stack.append(self.current)
+		self.current = self.redo_stack.pop()
+		self.log.append(entry)
+		return self.current
+
 class Planet():
 	def __init__(self, center):
 		self.center = center
@@ -55,6 +349,7 @@ class Planet():
 		self.color = QColor(randrange(0, 256, 1), randrange(0, 256, 1), randrange(0, 256, 1))
 		self.angle_ratio = 0.01
 		self.name = ""
+		self.trail = Trail(TRAIL_LENGTH)
 
 	def setRadius(self, radius):
 		self.radius = radius
@@ -94,32 +389,26 @@ class Planet():
 		else:
 			raise ValueError("Could not move object without selected parent.")
 
-	def draw(self, painter, scale):
+	def draw(self, batch, scale):
 		paint_rad = max(1, round(self.radius * scale))
 		circle_area = QRect(self.center.x() - paint_rad, self.center.y() - paint_rad, paint_rad * 2, paint_rad * 2)
-		pen = QPen()
-		pen.setColor(QColor(self.color.red(), self.color.green(), self.color.blue()))
-		pen.setStyle(Qt.PenStyle.SolidLine)
-		pen.setWidth(2)
-		painter.setPen(pen)
-		painter.setBrush(QColor(self.color.red(), self.color.green(), self.color.blue(), 90))
-		painter.drawEllipse(circle_area)			
+		batch.addEllipse(circle_area, QColor(self.color.red(), self.color.green(), self.color.blue()), QColor(self.color.red(), self.color.green(), self.color.blue(), 90))
 
-	def draw_zone(self, painter, scale, color):
+	def draw_zone(self, zones, bodies, scale, color):
 		soi_rad = round((self.radius + self.soi_radius) * scale)
 		lpo_rad = round((self.radius + self.lpo) * scale)
 		soi_area = QRect(self.center.x() - soi_rad, self.center.y() - soi_rad, soi_rad * 2, soi_rad * 2)
 		lpo_area = QRect(self.center.x() - lpo_rad, self.center.y() - lpo_rad, lpo_rad * 2, lpo_rad * 2)
-		pen = QPen()
-		pen.setColor(color)
-		pen.setStyle(Qt.PenStyle.DashLine)
-		pen.setWidth(2)
-		painter.setPen(pen)
-		painter.setBrush(QColor(color.red(), color.green(), color.blue(), round(color.alpha() / 2)))
-		painter.drawEllipse(soi_area)
-		painter.setBrush(QColor(255, 255, 255, 100))
-		painter.drawEllipse(lpo_area)
-		self.draw(painter, scale)
+		zones.addEllipse(soi_area, color, QColor(color.red(), color.green(), color.blue(), round(color.alpha() / 2)), 2, Qt.PenStyle.DashLine)
+		zones.addEllipse(lpo_area, color, QColor(255, 255, 255, 100), 2, Qt.PenStyle.DashLine)
+		self.draw(bodies, scale)
+
+	def state(self):
+		return (self.name, self.radius, self.soi_radius, self.lpo, self.parent, self.orbit_height, self.color.rgba(), self.angle_ratio)
+
+	def setState(self, state):
+		self.name, self.radius, self.soi_radius, self.lpo, self.parent, self.orbit_height, rgba, self.angle_ratio = state
+		self.color = QColor.fromRgba(rgba)
 
 	def getGeneration(self):
 		cur = self
@@ -139,6 +428,7 @@ class Satellite():
 		self.color = QColor(0, 255, 63, 100)
 		self.angle_ratio = 0.01
 		self.rating = 5
+		self.trail = Trail(TRAIL_LENGTH)
 
 	def setParent(self, parent):
 		self.parent = parent
@@ -168,16 +458,10 @@ class Satellite():
 		else:
 			raise ValueError("Could not move object without selected parent.")
 
-	def draw(self, painter, scale):
+	def draw(self, batch, scale):
 		paint_rad = 1 if max(1, round(self.parent.radius * scale)) <= self.radius else self.radius
 		circle_area = QRect(self.center.x() - paint_rad, self.center.y() - paint_rad, paint_rad * 2, paint_rad * 2)
-		pen = QPen()
-		pen.setColor(QColor(self.color.red(), self.color.green(), self.color.blue()))
-		pen.setStyle(Qt.PenStyle.SolidLine)
-		pen.setWidth(2)
-		painter.setPen(pen)
-		painter.setBrush(QColor(self.color.red(), self.color.green(), self.color.blue(), 90))
-		painter.drawEllipse(circle_area)	
+		batch.addEllipse(circle_area, QColor(self.color.red(), self.color.green(), self.color.blue()), QColor(self.color.red(), self.color.green(), self.color.blue(), 90))
 
 class Constellation():
 	def __init__(self, parent, const_sz, scale):
@@ -200,6 +484,15 @@ class Constellation():
 	def getSize(self):
 		return len(self.satellites)
 
+	def state(self):
+		return (self.name, self.orbit_height, self.rating, tuple(self.satellites))
+
+	def setState(self, state):
+		self.name, orbit_height, rating, satellites = state
+		self.satellites = list(satellites)
+		self.setOrbitHeight(orbit_height)
+		self.setSatelliteRating(rating)
+
 	def setName(self, name):
 		self.name = name
 
@@ -218,6 +511,7 @@ class Constellation():
 			tmp.setParent(self.parent)
 			tmp.setOrbitHeight(self.orbit_height)
 			tmp.autoAR()
+			tmp.setRating(self.rating)
 			tmp.autoCenter(scale)
 			angle += alpha
 			self.satellites.append(tmp)
@@ -227,21 +521,52 @@ class Constellation():
 		for satellite in self.satellites:
 			satellite.setRating(rating)
 
-	def draw(self, painter, scale):
-		for index, satellite in enumerate(self.satellites):
-			satellite.draw(painter, scale)
-			x1 = self.satellites[index].center.x()
-			y1 = self.satellites[index].center.y()
-			x2 = self.satellites[index+1].center.x() if index != len(self.satellites) - 1 else self.satellites[0].center.x()
-			y2 = self.satellites[index+1].center.y() if index != len(self.satellites) - 1 else self.satellites[0].center.y()
-			painter.drawLine(x1, y1, x2, y2)
+	def draw(self, batch, scale):
+		if len(self.satellites) == 0:
+			return
+		for satellite in self.satellites:
+			satellite.draw(batch, scale)
+		color = self.satellites[0].color
+		ring = batch.path(QColor(color.red(), color.green(), color.blue()), QColor(0, 0, 0, 0), 2, Qt.PenStyle.SolidLine)
+		ring.moveTo(QPointF(self.satellites[0].center))
+		for satellite in self.satellites[1:]:
+			ring.lineTo(QPointF(satellite.center))
+		ring.closeSubpath()
 
 	def move(self, angle, scale):
 		for satellite in self.satellites:
 			satellite.move(angle, scale)
 
+class Canvas(QWidget):
+	def __init__(self, scene):
+		super().__init__()
+		self.scene = scene
+		self.setFixedSize(900, 900)
+
+	def paintEvent(self, event):
+		painter = QPainter(self)
+		self.scene.paint_scene(painter)
+		painter.end()
+
+if QOpenGLWidget is not None:
+	class GLCanvas(QOpenGLWidget):
+		def __init__(self, scene):
+			super().__init__()
+			self.scene = scene
+			self.setFixedSize(900, 900)
+
+		def paintGL(self):
+			painter = QPainter(self)
+			self.scene.paint_scene(painter)
+			painter.end()
+
+def make_canvas(scene, accelerated):
+	if accelerated and QOpenGLWidget is not None:
+		return GLCanvas(scene)
+	return Canvas(scene)
+
 class MainWindow(QMainWindow):
-	def __init__(self):
+	def __init__(self, accelerated=False):
 		super().__init__()
 		self.setWindowTitle("Kerbal Satellite Relay Network")
 		self.setFixedSize(1300, 900)
@@ -255,18 +580,20 @@ class MainWindow(QMainWindow):
 		self.constellations = []
 		self.active_constellation = None
 		self.scale = 860 / (main_object.radius + main_object.soi_radius) / 2
+		self.tick = 0
+		self.link_history = LinkHistory(LINK_HISTORY_DEPTH)
+		self.outage_monitor = OutageMonitor()
 
-		canvas = QLabel()
-		canvas.setFixedSize(900, 900)
+		self.canvas = make_canvas(self, accelerated)
 
 		new_planet = QPushButton(text="☉")
 		new_planet.setFont(QFont('Times', 14))
 		new_planet.setFixedSize(30, 30)
-		new_planet.clicked.connect(self.new_planet)
+		new_planet.clicked.connect(lambda: self.edit(self.new_planet))
 		self.del_planet = QPushButton(text="🗑")
 		self.del_planet.setFont(QFont('Times', 14))
 		self.del_planet.setFixedSize(30, 30)
-		self.del_planet.clicked.connect(self.delete_planet)
+		self.del_planet.clicked.connect(lambda: self.edit(self.delete_planet))
 		self.planet_set = QComboBox()
 		self.planet_set.addItem("Центр")
 		self.planet_set.setCurrentIndex(self.active_obj)
@@ -331,13 +658,13 @@ class MainWindow(QMainWindow):
 		self.orbit_height_input.setMinimum(0)
 		self.orbit_height_input.setValue(0)
 		self.orbit_height_input.setDisabled(True)
-		self.obj_radius_input.editingFinished.connect(self.change_obj_radius)
-		self.orbit_height_input.editingFinished.connect(self.change_orbit_height)
-		self.soi_radius_input.editingFinished.connect(self.change_soi_radius)
-		self.lpo_input.editingFinished.connect(self.change_lpo)
-		self.parent_input.activated.connect(self.change_parent)
+		self.obj_radius_input.editingFinished.connect(lambda: self.edit(self.change_obj_radius))
+		self.orbit_height_input.editingFinished.connect(lambda: self.edit(self.change_orbit_height))
+		self.soi_radius_input.editingFinished.connect(lambda: self.edit(self.change_soi_radius))
+		self.lpo_input.editingFinished.connect(lambda: self.edit(self.change_lpo))
+		self.parent_input.activated.connect(lambda index: self.edit(self.change_parent, index))
 		self.planet_set.activated.connect(self.activate_object)
-		self.planet_name.editingFinished.connect(self.rename_object)
+		self.planet_name.editingFinished.connect(lambda: self.edit(self.rename_object))
 		self.color_button.clicked.connect(self.repaint_object)
 
 		planet_options = QVBoxLayout()
@@ -356,33 +683,33 @@ class MainWindow(QMainWindow):
 		self.constellation_size_input.setMinimum(3)
 		self.constellation_size_input.setMaximum(99)
 		self.constellation_size_input.setValue(3)
-		self.constellation_size_input.editingFinished.connect(self.change_constellation_size)
+		self.constellation_size_input.editingFinished.connect(lambda: self.edit(self.change_constellation_size))
 		self.constellation_size_input.setEnabled(False)
 		self.constellation_height_input = QSpinBox()
 		self.constellation_height_input.setSuffix(" км")
 		self.constellation_height_input.setMinimum(1)
 		self.constellation_height_input.setMaximum(2147483647)
-		self.constellation_height_input.editingFinished.connect(self.change_constellation_height)
+		self.constellation_height_input.editingFinished.connect(lambda: self.edit(self.change_constellation_height))
 		self.constellation_height_input.setEnabled(False)
 
 		constellation_rating_label = QLabel("Мощность антенны: ")
 		self.constellation_rating_input = QSpinBox()
 		self.constellation_rating_input.setMinimum(1)
 		self.constellation_rating_input.setMaximum(999)
-		self.constellation_rating_input.editingFinished.connect(self.change_satellite_rating)
+		self.constellation_rating_input.editingFinished.connect(lambda: self.edit(self.change_satellite_rating))
 		self.constellation_rating_input.setEnabled(False)
 		self.constellation_rating_multiplier_input = QComboBox()
-		self.constellation_rating_multiplier_input.activated.connect(self.change_satellite_rating)
+		self.constellation_rating_multiplier_input.activated.connect(lambda: self.edit(self.change_satellite_rating))
 		self.constellation_rating_multiplier_input.setEnabled(False)
 
 		new_constellation = QPushButton(text="🛰")
 		new_constellation.setFont(QFont('Times', 14))
 		new_constellation.setFixedSize(30, 30)
-		new_constellation.clicked.connect(self.new_constellation)
+		new_constellation.clicked.connect(lambda: self.edit(self.new_constellation))
 		self.del_constellation = QPushButton(text="🗑")
 		self.del_constellation.setFont(QFont('Times', 14))
 		self.del_constellation.setFixedSize(30, 30)
-		self.del_constellation.clicked.connect(self.delete_constellation)
+		self.del_constellation.clicked.connect(lambda: self.edit(self.delete_constellation))
 		self.constellation_set = QComboBox()
 		self.constellation_set.setFixedSize(295, 30)
 		self.constellation_set.activated.connect(self.activate_constellation)
@@ -391,7 +718,7 @@ class MainWindow(QMainWindow):
 		self.constellation_name.setFont(QFont('', 14))
 		self.constellation_name.setAlignment(Qt.AlignmentFlag.AlignCenter)
 		self.constellation_name.setEnabled(False)
-		self.constellation_name.editingFinished.connect(self.rename_constellation)
+		self.constellation_name.editingFinished.connect(lambda: self.edit(self.rename_constellation))
 
 		lt7 = QHBoxLayout()
 		lt7.addWidget(new_constellation)
@@ -440,8 +767,44 @@ class MainWindow(QMainWindow):
 		speed_slider.setValue(10)
 		speed_slider.sliderMoved.connect(self.restart_timer)
 
+		self.trails_input = QCheckBox("Следы орбит")
+		self.trails_input.toggled.connect(self.toggle_trails)
+		self.links_input = QCheckBox("История связей")
+		self.links_input.toggled.connect(self.toggle_link_history)
+		self.outages_input = QCheckBox("Контроль связи")
+		self.outages_input.toggled.connect(self.toggle_outages)
+		self.record_button = QPushButton("Записать журнал")
+		self.record_button.setEnabled(False)
+		self.record_button.clicked.connect(self.toggle_recording)
+
+		undo_button = QPushButton(text="↶")
+		undo_button.setFont(QFont('Times', 14))
+		undo_button.setFixedSize(30, 30)
+		undo_button.clicked.connect(self.undo)
+		redo_button = QPushButton(text="↷")
+		redo_button.setFont(QFont('Times', 14))
+		redo_button.setFixedSize(30, 30)
+		redo_button.clicked.connect(self.redo)
+		replay_button = QPushButton("Повторить сессию")
+		replay_button.clicked.connect(self.replay_session)
+		self.replay_label = QLabel()
+		QShortcut(QKeySequence.StandardKey.Undo, self).activated.connect(self.undo)
+		QShortcut(QKeySequence.StandardKey.Redo, self).activated.connect(self.redo)
+		QShortcut(QKeySequence("Ctrl+Y"), self).activated.connect(self.redo)
+
+		lt12 = QHBoxLayout()
+		lt12.addWidget(undo_button)
+		lt12.addWidget(redo_button)
+		lt12.addWidget(replay_button)
+
 		app_options = QVBoxLayout()
 		app_options.addWidget(speed_slider)
+		app_options.addWidget(self.trails_input)
+		app_options.addWidget(self.links_input)
+		app_options.addWidget(self.outages_input)
+		app_options.addWidget(self.record_button)
+		app_options.addLayout(lt12)
+		app_options.addWidget(self.replay_label)
 
 		options_lt = QHBoxLayout()
 		options_lt.addWidget(blank)
@@ -453,21 +816,25 @@ class MainWindow(QMainWindow):
 		controls_lt.addLayout(self.satellite_lt)
 		controls_lt.addLayout(options_lt)
 
-		main_lt = QHBoxLayout()
-		main_lt.addWidget(canvas)
-		main_lt.addLayout(controls_lt)
+		controls_lt.setContentsMargins(0, 11, 11, 11)
+
+		self.main_lt = QHBoxLayout()
+		self.main_lt.setContentsMargins(0, 0, 0, 0)
+		self.main_lt.addWidget(self.canvas)
+		self.main_lt.addLayout(controls_lt)
 
 		widget = QWidget()
-		widget.setLayout(main_lt)
+		widget.setLayout(self.main_lt)
 		widget.setFixedSize(1300, 900)
 		self.setCentralWidget(widget)
 
-		self.background_brush = widget.palette().base()
-
 		self.timer = QTimer()
 		self.timer.timeout.connect(self.move_satellites)
 		self.timer.start(10)
 
+		self.journal = Journal()
+		self.journal.start(self.snapshot())
+
 	def move_satellites(self):
 		for obj in self.objects:
 			if obj.parent is not None:
@@ -475,31 +842,169 @@ class MainWindow(QMainWindow):
 
 		for constellation in self.constellations:
 			constellation.move(0.001, self.scale)
-		self.update()
+		self.tick += 1
+		if self.tick % TRAIL_STEP == 0:
+			self.record_history()
+		self.canvas.update()
 
-	def paintEvent(self, event):
-		painter = QPainter(self)
+	def satellites(self):
+		return [satellite for constellation in self.constellations for satellite in constellation.satellites]
+
+	def line_of_sight(self, a, b, skip=None):
+		for obj in self.objects:
+			if obj is not skip and point_segment_range(obj.center, a.center, b.center) < obj.radius * self.scale:
+				return False
+		return True
+
+	def relay_links(self):
+		links = []
+		root = self.objects[0]
+		satellites = self.satellites()
+		for index, a in enumerate(satellites):
+			dx = a.center.x() - root.center.x()
+			dy = a.center.y() - root.center.y()
+			if sqrt(dx * dx + dy * dy) / self.scale - root.radius <= link_range(a.rating, ROOT_RATING) and self.line_of_sight(a, root, root):
+				links.append((a, root))
+			for b in satellites[index + 1:]:
+				dx = a.center.x() - b.center.x()
+				dy = a.center.y() - b.center.y()
+				if sqrt(dx * dx + dy * dy) / self.scale <= link_range(a.rating, b.rating) and self.line_of_sight(a, b):
+					links.append((a, b))
+		return links
+
+	def record_history(self):
+		if self.trails_input.isChecked():
+			for obj in self.objects:
+				if obj.parent is not None:
+					obj.trail.push(obj.center)
+			for satellite in self.satellites():
+				satellite.trail.push(satellite.center)
+		if self.links_input.isChecked() or self.outages_input.isChecked():
+			links = self.relay_links()
+			if self.links_input.isChecked():
+				self.link_history.push(links)
+			if self.outages_input.isChecked():
+				self.outage_monitor.update(self.tick, self.root_connectivity(links))
+				if self.outage_monitor.error is not None:
+					self.report_recording_error()
+
+	def root_connectivity(self, links):
+		graph = {}
+		for a, b in links:
+			graph.setdefault(a, []).append(b)
+			graph.setdefault(b, []).append(a)
+		reached = {self.objects[0]}
+		queue = [self.objects[0]]
+		while len(queue) > 0:
+			node = queue.pop()
+			for neighbour in graph.get(node, []):
+				if neighbour not in reached:
+					reached.add(neighbour)
+					queue.append(neighbour)
+		status = {}
+		for constellation in self.constellations:
+			if constellation.parent is not self.objects[0]:
+				status[constellation.parent] = status.get(constellation.parent, False) or any(satellite in reached for satellite in constellation.satellites)
+		return status
+
+	def clear_trails(self):
+		for obj in self.objects:
+			obj.trail.clear()
+		for satellite in self.satellites():
+			satellite.trail.clear()
+
+	def clear_history(self):
+		self.clear_trails()
+		self.link_history.clear()
+
+	def toggle_trails(self, checked):
+		if not checked:
+			self.clear_trails()
+
+	def toggle_link_history(self, checked):
+		if not checked:
+			self.link_history.clear()
+
+	def toggle_outages(self, checked):
+		self.record_button.setEnabled(checked)
+		if not checked:
+			self.outage_monitor.stop(self.tick)
+			self.outage_monitor.reset()
+			self.record_button.setText("Записать журнал")
+
+	def toggle_recording(self):
+		if self.outage_monitor.isRecording():
+			self.outage_monitor.stop(self.tick)
+			self.record_button.setText("Записать журнал")
+		else:
+			path, _ = QFileDialog.getSaveFileName(self, "Сохранить журнал", "connectivity.csv", "CSV (*.csv)")
+			if path:
+				try:
+					self.outage_monitor.start(path, self.tick)
+				except OSError as error:
+					QMessageBox.warning(self, "Ошибка записи", f'Не удалось открыть журнал: {error}')
+					return
+				self.record_button.setText("Остановить запись")
+
+	def report_recording_error(self):
+		error = self.outage_monitor.error
+		self.outage_monitor.error = None
+		self.record_button.setText("Записать журнал")
+		QMessageBox.warning(self, "Ошибка записи", f'Запись журнала остановлена: {error}')
+
+	def showEvent(self, event):
+		super().showEvent(event)
+		QTimer.singleShot(0, self.check_canvas)
+
+	def check_canvas(self):
+		if QOpenGLWidget is not None and isinstance(self.canvas, QOpenGLWidget) and not self.canvas.isValid():
+			canvas = Canvas(self)
+			self.main_lt.replaceWidget(self.canvas, canvas)
+			self.canvas.deleteLater()
+			self.canvas = canvas
+
+	def closeEvent(self, event):
+		self.outage_monitor.stop(self.tick)
+		super().closeEvent(event)
+
+	def paint_scene(self, painter):
 		fill = QRect(0, 0, 900, 900)
 		painter.setBrush(QBrush(QColor(255, 255, 255))) # White fill
 		painter.drawRect(fill)
 
+		if self.trails_input.isChecked():
+			trails = Batch()
+			for obj in self.objects:
+				obj.trail.draw(trails, obj.color)
+			for satellite in self.satellites():
+				satellite.trail.draw(trails, satellite.color)
+			trails.draw(painter)
+		if self.links_input.isChecked():
+			self.link_history.draw(painter)
+
+		bodies = Batch()
+		zones = Batch()
+		zone_bodies = Batch()
+		later_bodies = Batch()
 		for index, obj in enumerate(self.objects):
-			obj.draw(painter, self.scale)
+			obj.draw(bodies if index <= self.active_obj else later_bodies, self.scale)
 			if index == self.active_obj and obj.parent is not None:
-				obj.parent.draw_zone(painter, self.scale, QColor(0, 0, 0, 20))
-				obj.draw_zone(painter, self.scale, QColor(74, 219, 176, 90))
+				obj.parent.draw_zone(zones, zone_bodies, self.scale, QColor(0, 0, 0, 20))
+				obj.draw_zone(zones, zone_bodies, self.scale, QColor(74, 219, 176, 90))
 			elif index == self.active_obj:
-				obj.draw_zone(painter, self.scale, QColor(74, 219, 176, 90))
+				obj.draw_zone(zones, zone_bodies, self.scale, QColor(74, 219, 176, 90))
+		bodies.draw(painter)
+		zones.draw(painter)
+		zone_bodies.draw(painter)
+		later_bodies.draw(painter)
 
+		satellites = Batch()
 		for constellation in self.constellations:
-			constellation.draw(painter, self.scale)
-
-		controls_panel = QRect(900, 0, 400, 900)
-		painter.setPen(QPen(self.background_brush.color()))
-		painter.setBrush(self.background_brush)
-		painter.drawRect(controls_panel)
+			constellation.draw(satellites, self.scale)
+		satellites.draw(painter)
 
-		painter.end()
+		if self.outages_input.isChecked():
+			self.outage_monitor.draw(painter, self.scale, self.tick)
 
 	def restart_timer(self, timeout):
 		self.timer.stop()
@@ -627,7 +1132,82 @@ class MainWindow(QMainWindow):
 	def repaint_object(self):
 		color = QColorDialog.getColor(self.objects[self.active_obj].color, self, "Выберите цвет")
 		if color.isValid():
-			self.objects[self.active_obj].setColor(color)
+			self.edit(self.set_object_color, color.rgba())
+
+	def set_object_color(self, rgba):
+		self.objects[self.active_obj].setColor(QColor.fromRgba(rgba))
+
+	def snapshot(self):
+		return self.journal.snapshot(self.objects, self.constellations, self.active_obj, self.active_constellation)
+
+	def restore(self, snapshot):
+		objects, constellations, self.active_obj, self.active_constellation = snapshot
+		self.objects = []
+		for chunk in objects:
+			for obj, state in chunk:
+				obj.setState(state)
+				self.objects.append(obj)
+		self.constellations = []
+		for chunk in constellations:
+			for constellation, state in chunk:
+				constellation.setState(state)
+				self.constellations.append(constellation)
+		if self.fit_scale() != self.scale:
+			self.rescale()
+		self.refresh_interface()
+
+	def editor_state(self):
+		return (self.obj_radius_input.value(), self.orbit_height_input.value(), self.soi_radius_input.value(), self.lpo_input.value(), self.planet_name.text(), self.parent_input.currentText(), self.constellation_size_input.value(), self.constellation_height_input.value(), self.constellation_name.text(), self.constellation_rating_input.value(), self.constellation_rating_multiplier_input.currentText())
+
+	def set_editor_state(self, state):
+		obj_radius, orbit_height, soi_radius, lpo, planet_name, parent, constellation_size, constellation_height, constellation_name, rating, rating_mult = state
+		self.obj_radius_input.setValue(obj_radius)
+		self.orbit_height_input.setValue(orbit_height)
+		self.soi_radius_input.setValue(soi_radius)
+		self.lpo_input.setValue(lpo)
+		self.planet_name.setText(planet_name)
+		self.parent_input.setCurrentText(parent)
+		self.constellation_size_input.setValue(constellation_size)
+		self.constellation_height_input.setValue(constellation_height)
+		self.constellation_name.setText(constellation_name)
+		self.constellation_rating_input.setValue(rating)
+		self.constellation_rating_multiplier_input.setCurrentText(rating_mult)
+
+	def edit(self, action, *args):
+		active = (self.active_obj, self.active_constellation)
+		action(*args)
+		self.journal.commit(self.snapshot(), (action.__name__, args, active, self.editor_state()))
+
+	def undo(self):
+		snapshot = self.journal.undo(("undo", (), (self.active_obj, self.active_constellation), None))
+		if snapshot is not None:
+			self.restore(snapshot)
+
+	def redo(self):
+		snapshot = self.journal.redo(("redo", (), (self.active_obj, self.active_constellation), None))
+		if snapshot is not None:
+			self.restore(snapshot)
+
+	def replay_session(self):
+		session = self.journal
+		saved = self.snapshot()
+		self.restore(session.origin)
+		self.journal = Journal()
+		self.journal.start(self.snapshot())
+		started = perf_counter()
+		for name, args, active, inputs in session.log:
+			self.active_obj, self.active_constellation = active
+			self.refresh_interface()
+			if inputs is not None:
+				self.set_editor_state(inputs)
+			if name == "undo" or name == "redo":
+				getattr(self, name)()
+			else:
+				self.edit(getattr(self, name), *args)
+		elapsed = perf_counter() - started
+		self.journal = session
+		self.restore(saved)
+		self.replay_label.setText(f'Повтор: {len(session.log)} правок за {round(elapsed * 1000)} мс')
 
 	def children_max_gen(self, obj):
 		children = [1]
@@ -643,8 +1223,12 @@ class MainWindow(QMainWindow):
 				active_consts.append({"base": index, "obj": constellation})
 		return active_consts
 
+	def fit_scale(self):
+		return 860 / (self.objects[0].radius + self.objects[0].soi_radius) / 2
+
 	def rescale(self):
-		self.scale = 860 / (self.objects[0].radius + self.objects[0].soi_radius) / 2
+		self.scale = self.fit_scale()
+		self.clear_history()
 
 	def orbit_high_border(self, parent_obj, child_obj):
 		return parent_obj.soi_radius - (child_obj.soi_radius + child_obj.radius)
@@ -731,7 +1315,7 @@ class MainWindow(QMainWindow):
 
 if __name__ == "__main__":
 	app = QApplication(sys.argv)
-	window = MainWindow()
+	window = MainWindow("--opengl" in sys.argv)
 	window.show()
 
 	sys.exit(app.exec())
\ No newline at end of file